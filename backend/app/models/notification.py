@@ -7,7 +7,7 @@ from sqlalchemy.sql import func
 import enum
 import uuid
 
-from ..core.database import Base
+from .base import Base
 
 class NotificationType(enum.Enum):
     """Tipos de notificación"""
@@ -3,16 +3,30 @@
 Script para verificar dependencias y servicios del backend
 """
 import sys
-import subprocess
+import errno
+import select
 import socket
-import importlib
+import time
+from importlib.metadata import distribution, PackageNotFoundError
+from functools import lru_cache
 from pathlib import Path
-import requests
-from typing import Dict, List, Tuple
+from typing import Dict
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
+@lru_cache(maxsize=1)
+def _get_settings():
+    """Cargar la configuración una sola vez para todas las verificaciones"""
+    from app.core.config import get_settings
+    return get_settings()
+
+@lru_cache(maxsize=1)
+def _sqla():
+    """Importar SQLAlchemy solo cuando se verifica la base de datos"""
+    from sqlalchemy import create_engine, text
+    return create_engine, text
+
 def check_python_packages() -> Dict[str, bool]:
     """Verificar que los paquetes de Python estén instalados"""
     print("🐍 Verificando paquetes de Python...")
@@ -39,12 +53,14 @@ def check_python_packages() -> Dict[str, bool]:
     
     results = {}
     
+    # Consultar los metadatos instalados (.dist-info) sin ejecutar el código
+    # de cada paquete; los nombres se normalizan (python_jose == python-jose)
     for package in required_packages:
         try:
-            importlib.import_module(package.replace('-', '_'))
+            distribution(package)
             results[package] = True
             print(f"   ✅ {package}")
-        except ImportError:
+        except PackageNotFoundError:
             results[package] = False
             print(f"   ❌ {package}")
     
@@ -61,36 +77,73 @@ def check_services() -> Dict[str, bool]:
         'MinIO': ('localhost', 9000),
     }
     
-    results = {}
+    # Conexiones no bloqueantes: un único select espera a todos los servicios
+    # a la vez, así el tiempo total queda acotado a un timeout y no a N
+    timeout = 3
+    # En Windows connect_ex devuelve WSAEWOULDBLOCK en lugar de EINPROGRESS
+    in_progress = {errno.EINPROGRESS, errno.EWOULDBLOCK, getattr(errno, 'WSAEWOULDBLOCK', None)}
+    outcomes = {}
+    pending = {}
     
     for service_name, (host, port) in services.items():
+        sock = None
         try:
             sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(3)
+            sock.setblocking(False)
             result = sock.connect_ex((host, port))
-            sock.close()
-            
-            if result == 0:
-                results[service_name] = True
-                print(f"   ✅ {service_name} ({host}:{port})")
-            else:
-                results[service_name] = False
-                print(f"   ❌ {service_name} ({host}:{port}) - No disponible")
-                
         except Exception as e:
+            outcomes[service_name] = e
+            if sock is not None:
+                sock.close()
+            continue
+        
+        if result in in_progress:
+            pending[sock] = service_name
+        else:
+            outcomes[service_name] = result
+            sock.close()
+    
+    deadline = time.monotonic() + timeout
+    while pending:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        
+        _, writable, failed = select.select([], list(pending), list(pending), remaining)
+        for sock in set(writable) | set(failed):
+            outcomes[pending.pop(sock)] = sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            sock.close()
+    
+    for sock, service_name in pending.items():
+        outcomes[service_name] = errno.ETIMEDOUT
+        sock.close()
+    
+    results = {}
+    
+    for service_name, (host, port) in services.items():
+        outcome = outcomes[service_name]
+        
+        if isinstance(outcome, Exception):
+            results[service_name] = False
+            print(f"   ❌ {service_name} ({host}:{port}) - Error: {outcome}")
+        elif outcome == 0:
+            results[service_name] = True
+            print(f"   ✅ {service_name} ({host}:{port})")
+        else:
             results[service_name] = False
-            print(f"   ❌ {service_name} ({host}:{port}) - Error: {e}")
+            print(f"   ❌ {service_name} ({host}:{port}) - No disponible")
     
     return results
 
-def check_environment_config() -> Dict[str, bool]:
+def check_environment_config(settings) -> Dict[str, bool]:
     """Verificar configuración del environment"""
     print("\n⚙️ Verificando configuración del environment...")
     
+    if settings is None:
+        print("   ❌ Configuración no disponible")
+        return {'Configuración': False}
+    
     try:
-        from app.core.config import get_settings
-        settings = get_settings()
-        
         checks = {
             'SECRET_KEY configurado': len(settings.SECRET_KEY) >= 32,
             'DATABASE_URL configurado': bool(settings.DATABASE_URL),
@@ -108,15 +161,16 @@ def check_environment_config() -> Dict[str, bool]:
         print(f"   ❌ Error cargando configuración: {e}")
         return {'Configuración': False}
 
-def check_database_connection() -> bool:
+def check_database_connection(settings) -> bool:
     """Verificar conexión a la base de datos"""
     print("\n🗄️ Verificando conexión a la base de datos...")
     
+    if settings is None:
+        print("   ❌ Configuración no disponible")
+        return False
+    
     try:
-        from app.core.config import get_settings
-        from sqlalchemy import create_engine, text
-        
-        settings = get_settings()
+        create_engine, text = _sqla()
         
         # Para SQLite
         if settings.DATABASE_URL.startswith('sqlite'):
@@ -142,14 +196,15 @@ def check_database_connection() -> bool:
         print(f"   ❌ Error conectando a la base de datos: {e}")
         return False
 
-def check_api_keys() -> Dict[str, bool]:
+def check_api_keys(settings) -> Dict[str, bool]:
     """Verificar que las API keys estén configuradas"""
     print("\n🔑 Verificando API keys...")
     
+    if settings is None:
+        print("   ❌ Configuración no disponible")
+        return {}
+    
     try:
-        from app.core.config import get_settings
-        settings = get_settings()
-        
         checks = {
             'OpenAI API Key': bool(settings.OPENAI_API_KEY and not settings.OPENAI_API_KEY.startswith('your-')),
             'Stripe Keys': bool(settings.STRIPE_SECRET_KEY and not settings.STRIPE_SECRET_KEY.startswith('sk_test_your-')),
@@ -239,12 +294,19 @@ def main():
     
     results = {}
     
+    # Cargar la configuración una sola vez y compartirla entre verificaciones
+    try:
+        settings = _get_settings()
+    except Exception as e:
+        print(f"❌ Error cargando configuración: {e}")
+        settings = None
+    
     # Ejecutar todas las verificaciones
     results['Paquetes Python'] = check_python_packages()
     results['Servicios Externos'] = check_services()
-    results['Configuración'] = check_environment_config()
-    results['Conexión BD'] = check_database_connection()
-    results['API Keys'] = check_api_keys()
+    results['Configuración'] = check_environment_config(settings)
+    results['Conexión BD'] = check_database_connection(settings)
+    results['API Keys'] = check_api_keys(settings)
     results['Permisos Archivos'] = check_file_permissions()
     
     # Generar reporte
@@ -0,0 +1,79 @@
+"""
+Utilidades compartidas por los scripts de base de datos
+"""
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from typing import Tuple
+
+from sqlalchemy import MetaData
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from app.core.security import SecurityManager, pwd_context
+
+# PRAGMAs para las bases de datos SQLite de desarrollo: WAL con
+# synchronous=NORMAL evita un fsync por transacción, y las tablas temporales,
+# el mmap y la caché de páginas se quedan en memoria
+SQLITE_PRAGMAS = """
+    PRAGMA journal_mode=WAL;
+    PRAGMA synchronous=NORMAL;
+    PRAGMA temp_store=MEMORY;
+    PRAGMA mmap_size=268435456;
+    PRAGMA cache_size=-65536;
+"""
+
+# Archivos auxiliares que SQLite crea junto a la base de datos (WAL y rollback journal)
+SQLITE_SIDECAR_SUFFIXES = ("-wal", "-shm", "-journal")
+
+def new_id() -> str:
+    """Generar un id nuevo
+
+    Formato canónico con guiones: los modelos guardan los ids como
+    String(36), igual que el default de UUIDMixin.
+    """
+    return str(uuid.uuid4())
+
+def remove_sqlite_files(db_path: Path):
+    """Borrar una base de datos SQLite junto con sus archivos auxiliares
+
+    Un -wal o -journal huérfano se aplicaría sobre la nueva base de datos
+    con el mismo nombre y la dejaría corrupta.
+    """
+    db_path.unlink(missing_ok=True)
+    for suffix in SQLITE_SIDECAR_SUFFIXES:
+        Path(f"{db_path}{suffix}").unlink(missing_ok=True)
+
+@compiles(postgresql.UUID, "sqlite")
+def _compile_postgresql_uuid_for_sqlite(type_, compiler, **kw):
+    """Varios modelos usan el UUID de PostgreSQL, que SQLite no sabe representar"""
+    return "CHAR(36)"
+
+@lru_cache(maxsize=None)
+def compile_sqlite_schema(metadata: MetaData, if_not_exists: bool = False) -> Tuple[str, ...]:
+    """DDL de SQLite (tablas e índices) compilado una sola vez
+
+    Hay que importar app.models antes de llamarla para que todas las tablas
+    estén registradas en el metadata.
+    """
+    dialect = sqlite.dialect()
+    statements = []
+    for table in metadata.sorted_tables:
+        statements.append(str(CreateTable(table, if_not_exists=if_not_exists).compile(dialect=dialect)).strip())
+        for index in table.indexes:
+            statements.append(str(CreateIndex(index, if_not_exists=if_not_exists).compile(dialect=dialect)).strip())
+    return tuple(statements)
+
+def hash_passwords(passwords):
+    """Calcular los hashes en paralelo
+
+    bcrypt libera el GIL, así que unos pocos hilos bastan y evitan el coste
+    de arrancar procesos que reimporten la aplicación.
+    """
+    # Cargar el backend de bcrypt una sola vez antes de repartir el trabajo,
+    # en lugar de que cada hilo lo inicialice en su primer hash
+    pwd_context.handler().get_backend()
+    with ThreadPoolExecutor(max_workers=len(passwords)) as executor:
+        return list(executor.map(SecurityManager.get_password_hash, passwords))
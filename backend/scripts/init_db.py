@@ -5,151 +5,175 @@ Script para inicializar la base de datos con datos de prueba
 import asyncio
 import sys
 import os
+from functools import lru_cache
 from pathlib import Path
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
+from sqlalchemy import create_engine, insert
 from sqlalchemy.ext.asyncio import create_async_engine
 from app.core.config import get_settings
-from app.core.database import Base
-from app.models.user import User
-from app.models.company import Company
-from app.models.chatbot import Chatbot
+from app.models.base import Base
+from app.models.user import User, UserRole, UserStatus
+from app.models.company import Company, CompanyStatus, CompanyType
+from app.models.chatbot import AIProvider, Chatbot, ChatbotStatus
 from app.core.security import SecurityManager
+from scripts import common  # noqa: F401 - Registra el tipo UUID de PostgreSQL para SQLite
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 settings = get_settings()
 
+@lru_cache(maxsize=1)
+def _engine():
+    """Motor asíncrono compartido por todas las fases de inicialización"""
+    return create_async_engine(settings.DATABASE_URL_ASYNC, pool_pre_ping=True)
+
+@lru_cache(maxsize=1)
+def _sync_engine():
+    """Motor síncrono para el DDL, sin el puente asyncio → greenlet de run_sync"""
+    return create_engine(settings.DATABASE_URL)
+
+async def dispose_engine():
+    """Cerrar el pool de los motores compartidos"""
+    await _engine().dispose()
+    _sync_engine().dispose()
+
 async def create_tables():
     """Crear todas las tablas"""
     print("🔧 Creando tablas de la base de datos...")
     
-    engine = create_async_engine(settings.DATABASE_URL_ASYNC, echo=True)
+    Base.metadata.create_all(_sync_engine())
     
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    
-    await engine.dispose()
     print("✅ Tablas creadas exitosamente")
 
 async def create_test_data():
     """Crear datos de prueba"""
     print("📝 Creando datos de prueba...")
     
-    engine = create_async_engine(settings.DATABASE_URL_ASYNC)
+    engine = _engine()
     async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
     
+    # El hash de contraseñas es costoso en CPU: se calcula en hilos mientras
+    # se inserta la empresa
+    password_hashes = asyncio.gather(
+        asyncio.to_thread(SecurityManager.get_password_hash, "admin123"),
+        asyncio.to_thread(SecurityManager.get_password_hash, "user123")
+    )
+    
+    company = {
+        "name": "TechCorp Demo",
+        "slug": "techcorp-demo",
+        "email": "admin@techcorp.com",
+        "website": "https://techcorp-demo.com",
+        "description": "Empresa de demostración para ConversaAI",
+        "company_type": CompanyType.OTHER,
+        "status": CompanyStatus.ACTIVE
+    }
+    
+    users = [
+        {
+            "email": "admin@techcorp.com",
+            "first_name": "Administrador",
+            "last_name": "Demo",
+            "role": UserRole.SUPER_ADMIN,
+            "status": UserStatus.ACTIVE,
+            "is_active": True,
+            "is_verified": True
+        },
+        {
+            "email": "user@techcorp.com",
+            "first_name": "Usuario",
+            "last_name": "Demo",
+            "role": UserRole.VIEWER,
+            "status": UserStatus.ACTIVE,
+            "is_active": True,
+            "is_verified": True
+        }
+    ]
+    
+    # created_by referencia el email del autor; se resuelve con los IDs
+    # devueltos por el INSERT de usuarios
+    chatbots = [
+        {
+            "name": "Asistente de Ventas",
+            "description": "Chatbot especializado en ventas y atención al cliente",
+            "primary_ai_provider": AIProvider.OPENAI_GPT4_MINI,
+            "custom_instructions": "Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
+            "temperature": 70,
+            "max_tokens": 150,
+            "status": ChatbotStatus.ACTIVE,
+            "created_by": "admin@techcorp.com"
+        },
+        {
+            "name": "Soporte Técnico",
+            "description": "Chatbot para resolver problemas técnicos y dudas sobre productos",
+            "primary_ai_provider": AIProvider.OPENAI_GPT4,
+            "custom_instructions": "Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
+            "temperature": 30,
+            "max_tokens": 200,
+            "status": ChatbotStatus.ACTIVE,
+            "created_by": "admin@techcorp.com"
+        },
+        {
+            "name": "Asistente General",
+            "description": "Chatbot de propósito general para consultas diversas",
+            "primary_ai_provider": AIProvider.GEMINI_FLASH,
+            "custom_instructions": "Eres un asistente virtual útil y amigable. Respondes preguntas generales y ayudas con diversas consultas.",
+            "temperature": 50,
+            "max_tokens": 180,
+            "status": ChatbotStatus.DRAFT,
+            "created_by": "user@techcorp.com"
+        }
+    ]
+    
     async with async_session() as session:
         try:
-            # Crear empresa de prueba
-            company = Company(
-                name="TechCorp Demo",
-                slug="techcorp-demo",
-                email="admin@techcorp.com",
-                website="https://techcorp-demo.com",
-                description="Empresa de demostración para ConversaAI",
-                company_type="other",
-                status="active"
-            )
-            session.add(company)
-            await session.flush()  # Para obtener el ID
-            
-            # Crear usuario administrador
-            admin_user = User(
-                email="admin@techcorp.com",
-                hashed_password=SecurityManager.get_password_hash("admin123"),
-                full_name="Administrador Demo",
-                role="SUPERADMIN",
-                is_active=True,
-                is_verified=True,
-                company_id=company.id
-            )
-            session.add(admin_user)
-            
-            # Crear usuario regular
-            regular_user = User(
-                email="user@techcorp.com",
-                hashed_password=SecurityManager.get_password_hash("user123"),
-                full_name="Usuario Demo",
-                role="USER",
-                is_active=True,
-                is_verified=True,
-                company_id=company.id
-            )
-            session.add(regular_user)
-            
-            await session.flush()  # Para obtener los IDs de usuarios
-            
-            # Crear chatbots de prueba
-            chatbot1 = Chatbot(
-                name="Asistente de Ventas",
-                description="Chatbot especializado en ventas y atención al cliente",
-                model="gpt-3.5-turbo",
-                system_prompt="Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
-                temperature=0.7,
-                max_tokens=150,
-                status="ACTIVE",
-                company_id=company.id,
-                created_by=admin_user.id
-            )
-            session.add(chatbot1)
-            
-            chatbot2 = Chatbot(
-                name="Soporte Técnico",
-                description="Chatbot para resolver problemas técnicos y dudas sobre productos",
-                model="gpt-4",
-                system_prompt="Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
-                temperature=0.3,
-                max_tokens=200,
-                status="ACTIVE",
-                company_id=company.id,
-                created_by=admin_user.id
-            )
-            session.add(chatbot2)
-            
-            chatbot3 = Chatbot(
-                name="Asistente General",
-                description="Chatbot de propósito general para consultas diversas",
-                model="claude-3-sonnet",
-                system_prompt="Eres un asistente virtual útil y amigable. Respondes preguntas generales y ayudas con diversas consultas.",
-                temperature=0.5,
-                max_tokens=180,
-                status="DRAFT",
-                company_id=company.id,
-                created_by=regular_user.id
-            )
-            session.add(chatbot3)
-            
-            await session.commit()
+            # Una sola transacción: empresa, usuarios y chatbots en tres
+            # sentencias; los IDs generados se leen con RETURNING sin flush
+            async with session.begin():
+                result = await session.execute(
+                    insert(Company).values(company).returning(Company.id)
+                )
+                company_id = result.scalar_one()
+                
+                hashed_passwords = await password_hashes
+                result = await session.execute(
+                    insert(User).values([
+                        {**user, "hashed_password": hashed_password, "company_id": company_id}
+                        for user, hashed_password in zip(users, hashed_passwords)
+                    ]).returning(User.id, User.email)
+                )
+                user_ids = {email: user_id for user_id, email in result.all()}
+                
+                await session.execute(insert(Chatbot).values([
+                    {**chatbot, "company_id": company_id, "created_by": user_ids[chatbot["created_by"]]}
+                    for chatbot in chatbots
+                ]))
             
             print("✅ Datos de prueba creados exitosamente:")
             print(f"   👤 Admin: admin@techcorp.com / admin123")
             print(f"   👤 Usuario: user@techcorp.com / user123")
-            print(f"   🏢 Empresa: {company.name}")
-            print(f"   🤖 Chatbots: {chatbot1.name}, {chatbot2.name}, {chatbot3.name}")
+            print(f"   🏢 Empresa: {company['name']}")
+            print(f"   🤖 Chatbots: {', '.join(chatbot['name'] for chatbot in chatbots)}")
             
         except Exception as e:
-            await session.rollback()
             print(f"❌ Error creando datos de prueba: {e}")
             raise
-        finally:
-            await session.close()
-    
-    await engine.dispose()
+
+def _reset_schema(connection):
+    """Eliminar y recrear el esquema sobre una misma conexión síncrona"""
+    Base.metadata.drop_all(connection)
+    Base.metadata.create_all(connection)
 
 async def reset_database():
     """Resetear la base de datos (eliminar y recrear)"""
     print("🗑️ Reseteando base de datos...")
     
-    engine = create_async_engine(settings.DATABASE_URL_ASYNC)
-    
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+    with _sync_engine().begin() as conn:
+        _reset_schema(conn)
     
-    await engine.dispose()
     print("✅ Base de datos reseteada")
 
 async def main():
@@ -176,6 +200,8 @@ async def main():
     except Exception as e:
         print(f"❌ Error durante la inicialización: {e}")
         sys.exit(1)
+    finally:
+        await dispose_engine()
 
 if __name__ == "__main__":
     asyncio.run(main())
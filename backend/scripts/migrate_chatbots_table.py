@@ -9,21 +9,39 @@ from datetime import datetime
 # Agregar el directorio padre al path para importar módulos
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+# Versión de esquema registrada en PRAGMA user_version tras migrar
+SCHEMA_VERSION = 1
+
+def _flush_log(log):
+    """Emitir los mensajes acumulados en una sola escritura"""
+    if log:
+        sys.stdout.write("\n".join(log) + "\n")
+        log.clear()
+
 def migrate_chatbots_table():
     """Migrar tabla chatbots a estructura completa"""
     
     db_path = "chatbot_minimal.db"
+    conn = None
+    log = []
     
     try:
         conn = sqlite3.connect(db_path)
         cursor = conn.cursor()
         
-        print("🔄 Iniciando migración de tabla chatbots...")
+        log.append("🔄 Iniciando migración de tabla chatbots...")
+        
+        # 0. Saltar si la base de datos ya fue migrada
+        cursor.execute("PRAGMA user_version")
+        if cursor.fetchone()[0] >= SCHEMA_VERSION:
+            log.append("✅ La tabla chatbots ya está migrada")
+            return True
         
         # 1. Verificar estructura actual
         cursor.execute("PRAGMA table_info(chatbots)")
-        current_columns = {row[1]: row[2] for row in cursor.fetchall()}
-        print(f"📋 Columnas actuales: {list(current_columns.keys())}")
+        column_names = [row[1] for row in cursor.fetchall()]
+        current_columns = frozenset(column_names)
+        log.append(f"📋 Columnas actuales: {column_names}")
         
         # 2. Definir columnas que necesitamos agregar
         new_columns = {
@@ -56,50 +74,67 @@ def migrate_chatbots_table():
         
         # 3. Agregar columnas faltantes
         columns_added = 0
+        failed_columns = []
         for column_name, column_type in new_columns.items():
             if column_name not in current_columns:
                 try:
                     alter_sql = f"ALTER TABLE chatbots ADD COLUMN {column_name} {column_type}"
                     cursor.execute(alter_sql)
-                    print(f"✅ Agregada columna: {column_name}")
+                    log.append(f"✅ Agregada columna: {column_name}")
                     columns_added += 1
                 except sqlite3.Error as e:
-                    print(f"❌ Error agregando columna {column_name}: {e}")
+                    log.append(f"❌ Error agregando columna {column_name}: {e}")
+                    failed_columns.append(column_name)
         
         # 4. Actualizar registros existentes con valores por defecto
         if columns_added > 0:
-            print("🔄 Actualizando registros existentes...")
+            log.append("🔄 Actualizando registros existentes...")
             
-            # Actualizar valores por defecto para registros existentes
-            update_queries = [
-                "UPDATE chatbots SET is_public = FALSE WHERE is_public IS NULL",
-                "UPDATE chatbots SET primary_ai_provider = 'openai' WHERE primary_ai_provider IS NULL",
-                "UPDATE chatbots SET max_conversation_length = 20 WHERE max_conversation_length IS NULL",
-                "UPDATE chatbots SET response_delay_ms = 1000 WHERE response_delay_ms IS NULL",
-                "UPDATE chatbots SET enable_typing_indicator = TRUE WHERE enable_typing_indicator IS NULL",
-                "UPDATE chatbots SET enable_context_memory = TRUE WHERE enable_context_memory IS NULL",
-                "UPDATE chatbots SET enable_sentiment_analysis = FALSE WHERE enable_sentiment_analysis IS NULL",
-                "UPDATE chatbots SET enable_language_detection = FALSE WHERE enable_language_detection IS NULL",
-                "UPDATE chatbots SET enable_content_filter = TRUE WHERE enable_content_filter IS NULL",
-                "UPDATE chatbots SET enable_rate_limiting = TRUE WHERE enable_rate_limiting IS NULL",
-                "UPDATE chatbots SET max_messages_per_hour = 100 WHERE max_messages_per_hour IS NULL",
-                "UPDATE chatbots SET total_conversations = 0 WHERE total_conversations IS NULL",
-                "UPDATE chatbots SET total_messages = 0 WHERE total_messages IS NULL",
-                "UPDATE chatbots SET average_rating = 0.0 WHERE average_rating IS NULL",
-                "UPDATE chatbots SET is_deleted = FALSE WHERE is_deleted IS NULL",
-                "UPDATE chatbots SET version = 1 WHERE version IS NULL"
-            ]
+            # Valores por defecto para registros existentes
+            column_defaults = {
+                'is_public': False,
+                'primary_ai_provider': 'openai',
+                'max_conversation_length': 20,
+                'response_delay_ms': 1000,
+                'enable_typing_indicator': True,
+                'enable_context_memory': True,
+                'enable_sentiment_analysis': False,
+                'enable_language_detection': False,
+                'enable_content_filter': True,
+                'enable_rate_limiting': True,
+                'max_messages_per_hour': 100,
+                'total_conversations': 0,
+                'total_messages': 0,
+                'average_rating': 0.0,
+                'is_deleted': False,
+                'version': 1
+            }
             
-            for query in update_queries:
+            # Solo las columnas que existen tras el paso 3: si alguna no se pudo
+            # agregar, el resto igualmente recibe sus valores por defecto
+            column_defaults = {
+                column: default
+                for column, default in column_defaults.items()
+                if column not in failed_columns
+            }
+            
+            # Una sola sentencia parametrizada (un parse y un recorrido de la
+            # tabla) en lugar de un UPDATE por columna
+            assignments = ", ".join(f"{column} = COALESCE({column}, ?)" for column in column_defaults)
+            conditions = " OR ".join(f"{column} IS NULL" for column in column_defaults)
+            if column_defaults:
                 try:
-                    cursor.execute(query)
+                    cursor.execute(
+                        f"UPDATE chatbots SET {assignments} WHERE {conditions}",
+                        tuple(column_defaults.values())
+                    )
                 except sqlite3.Error as e:
-                    print(f"⚠️ Warning en actualización: {e}")
+                    log.append(f"⚠️ Warning en actualización: {e}")
         
         # 5. Verificar estructura final
         cursor.execute("PRAGMA table_info(chatbots)")
-        final_columns = [row[1] for row in cursor.fetchall()]
-        print(f"📋 Columnas finales: {len(final_columns)} columnas")
+        final_columns = cursor.fetchall()
+        log.append(f"📋 Columnas finales: {len(final_columns)} columnas")
         
         # 6. Crear índices para mejorar rendimiento
         indices = [
@@ -109,47 +144,57 @@ def migrate_chatbots_table():
             "CREATE INDEX IF NOT EXISTS idx_chatbots_is_deleted ON chatbots(is_deleted)"
         ]
         
-        print("🔄 Creando índices...")
+        log.append("🔄 Creando índices...")
         for index_sql in indices:
             try:
                 cursor.execute(index_sql)
-                print(f"✅ Índice creado")
+                log.append(f"✅ Índice creado")
             except sqlite3.Error as e:
-                print(f"⚠️ Warning creando índice: {e}")
-        
-        # Confirmar cambios
+                log.append(f"⚠️ Warning creando índice: {e}")
+        
+        # Registrar la versión de esquema solo si la migración quedó completa;
+        # si no, la próxima ejecución reintenta las columnas que fallaron
+        if failed_columns:
+            log.append(f"⚠️ Columnas sin agregar: {', '.join(failed_columns)}; no se marca la versión de esquema")
+        else:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
         conn.commit()
         
-        print(f"✅ Migración completada exitosamente!")
-        print(f"📊 Columnas agregadas: {columns_added}")
-        print(f"📊 Total de columnas: {len(final_columns)}")
+        if failed_columns:
+            log.append(f"⚠️ Migración incompleta: vuelve a ejecutar el script tras corregir los errores")
+        else:
+            log.append(f"✅ Migración completada exitosamente!")
+        log.append(f"📊 Columnas agregadas: {columns_added}")
+        log.append(f"📊 Total de columnas: {len(final_columns)}")
         
-        return True
+        # Verificar reutilizando la conexión y el esquema ya leído
+        log.append("\n🔍 Verificando migración...")
+        _flush_log(log)
+        verify_migration(conn, final_columns)
+        
+        return not failed_columns
         
     except Exception as e:
-        print(f"❌ Error en migración: {e}")
+        log.append(f"❌ Error en migración: {e}")
         if conn:
             conn.rollback()
         return False
         
     finally:
+        _flush_log(log)
         if conn:
             conn.close()
 
 
-def verify_migration():
+def verify_migration(conn, final_columns):
     """Verificar que la migración fue exitosa"""
     try:
-        conn = sqlite3.connect("chatbot_minimal.db")
         cursor = conn.cursor()
         
         # Verificar estructura
-        cursor.execute("PRAGMA table_info(chatbots)")
-        columns = cursor.fetchall()
-        
         print("\n📋 ESTRUCTURA FINAL DE LA TABLA CHATBOTS:")
         print("-" * 60)
-        for col in columns:
+        for col in final_columns:
             print(f"{col[1]:<30} {col[2]:<20} {'NOT NULL' if col[3] else 'NULL'}")
         
         # Verificar datos existentes
@@ -164,7 +209,6 @@ def verify_migration():
             for row in rows:
                 print(f"  ID: {row[0][:8]}... | Nombre: {row[1]} | Status: {row[2]} | Provider: {row[3]}")
         
-        conn.close()
         return True
         
     except Exception as e:
@@ -178,8 +222,6 @@ if __name__ == "__main__":
     
     # Ejecutar migración
     if migrate_chatbots_table():
-        print("\n🔍 Verificando migración...")
-        verify_migration()
         print("\n🎉 ¡Migración completada exitosamente!")
         print("\n📝 Próximos pasos:")
         print("1. Reiniciar el servidor backend")
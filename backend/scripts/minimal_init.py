@@ -6,29 +6,68 @@ import asyncio
 import sys
 import os
 import sqlite3
-import uuid
 from pathlib import Path
 from datetime import datetime
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from app.core.security import SecurityManager
+from scripts.common import SQLITE_PRAGMAS, hash_passwords, new_id
+
+def _values_placeholders(rows):
+    """Placeholders "(?, ...), (?, ...)" para un INSERT multi-fila"""
+    row_placeholders = "(" + ", ".join("?" * len(rows[0])) + ")"
+    return ", ".join([row_placeholders] * len(rows))
 
 def create_minimal_db():
     """Crear base de datos mínima con datos básicos"""
     print("🎯 Creando base de datos mínima...")
     
-    # Eliminar base de datos existente si existe
+    # La base de datos existente se reemplaza completa al final, con el backup
     db_path = Path(__file__).parent.parent / "chatbot_minimal.db"
-    if db_path.exists():
-        db_path.unlink()
     
-    # Crear conexión
-    conn = sqlite3.connect(str(db_path))
+    # Datos de prueba (los hashes se calculan antes de abrir la transacción)
+    company_id = new_id()
+    admin_id = new_id()
+    user_id = new_id()
+    
+    admin_password, user_password = hash_passwords(["admin123", "user123"])
+    
+    users_rows = [
+        (admin_id, "admin@techcorp.com", admin_password, "Administrador Demo", "SUPERADMIN", company_id),
+        (user_id, "user@techcorp.com", user_password, "Usuario Demo", "USER", company_id)
+    ]
+    
+    chatbots_rows = [
+        (
+            new_id(),
+            "Asistente de Ventas",
+            "Chatbot especializado en ventas y atención al cliente",
+            "gpt-3.5-turbo",
+            "Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
+            company_id,
+            admin_id
+        ),
+        (
+            new_id(),
+            "Soporte Técnico",
+            "Chatbot para resolver problemas técnicos y dudas sobre productos",
+            "gpt-4",
+            "Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
+            company_id,
+            admin_id
+        )
+    ]
+    
+    # Construir en memoria (sin fsync) y volcar a disco con un único backup
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.executescript("PRAGMA synchronous=OFF; PRAGMA temp_store=MEMORY;")
     cursor = conn.cursor()
     
     try:
+        # Esquema y datos en una única transacción explícita
+        cursor.execute("BEGIN")
+        
         # Crear tabla companies
         cursor.execute("""
             CREATE TABLE companies (
@@ -83,60 +122,33 @@ def create_minimal_db():
             )
         """)
         
-        # Insertar datos de prueba
-        company_id = str(uuid.uuid4())
-        admin_id = str(uuid.uuid4())
-        user_id = str(uuid.uuid4())
-        
         # Insertar empresa
         cursor.execute("""
             INSERT INTO companies (id, name, slug, email, company_type, status)
             VALUES (?, ?, ?, ?, ?, ?)
         """, (company_id, "TechCorp Demo", "techcorp-demo", "admin@techcorp.com", "other", "active"))
         
-        # Insertar usuarios
-        admin_password = SecurityManager.get_password_hash("admin123")
-        cursor.execute("""
-            INSERT INTO users (id, email, hashed_password, full_name, role, company_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (admin_id, "admin@techcorp.com", admin_password, "Administrador Demo", "SUPERADMIN", company_id))
-        
-        user_password = SecurityManager.get_password_hash("user123")
-        cursor.execute("""
+        # Insertar usuarios y chatbots con un INSERT multi-fila por tabla
+        # (pocas filas: muy por debajo del límite de parámetros de SQLite)
+        cursor.execute(f"""
             INSERT INTO users (id, email, hashed_password, full_name, role, company_id)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (user_id, "user@techcorp.com", user_password, "Usuario Demo", "USER", company_id))
+            VALUES {_values_placeholders(users_rows)}
+        """, [value for row in users_rows for value in row])
         
-        # Insertar chatbots
-        chatbot1_id = str(uuid.uuid4())
-        cursor.execute("""
+        cursor.execute(f"""
             INSERT INTO chatbots (id, name, description, model, system_prompt, company_id, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            chatbot1_id,
-            "Asistente de Ventas",
-            "Chatbot especializado en ventas y atención al cliente",
-            "gpt-3.5-turbo",
-            "Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
-            company_id,
-            admin_id
-        ))
+            VALUES {_values_placeholders(chatbots_rows)}
+        """, [value for row in chatbots_rows for value in row])
         
-        chatbot2_id = str(uuid.uuid4())
-        cursor.execute("""
-            INSERT INTO chatbots (id, name, description, model, system_prompt, company_id, created_by)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            chatbot2_id,
-            "Soporte Técnico",
-            "Chatbot para resolver problemas técnicos y dudas sobre productos",
-            "gpt-4",
-            "Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
-            company_id,
-            admin_id
-        ))
+        cursor.execute("COMMIT")
         
-        conn.commit()
+        # Reemplazar el archivo en disco de una sola vez
+        disk_conn = sqlite3.connect(str(db_path), isolation_level=None)
+        try:
+            conn.backup(disk_conn)
+            disk_conn.executescript(SQLITE_PRAGMAS)
+        finally:
+            disk_conn.close()
         
         print("✅ Base de datos mínima creada exitosamente:")
         print(f"   📁 Archivo: {db_path}")
@@ -159,33 +171,28 @@ def update_config():
     
     env_file = Path(__file__).parent.parent / ".env"
     
-    # Leer archivo existente
-    lines = []
-    if env_file.exists():
-        with open(env_file, 'r') as f:
-            lines = f.readlines()
+    content = env_file.read_text() if env_file.exists() else ""
     
-    # Actualizar o agregar configuración de base de datos
-    db_url_found = False
-    db_async_url_found = False
+    # Reemplazos por prefijo; las claves que no aparezcan se agregan al final
+    replacements = {
+        'DATABASE_URL=': 'DATABASE_URL="sqlite:///./chatbot_minimal.db"',
+        'DATABASE_URL_ASYNC=': 'DATABASE_URL_ASYNC="sqlite+aiosqlite:///./chatbot_minimal.db"',
+    }
+    remaining = set(replacements)
     
-    for i, line in enumerate(lines):
-        if line.startswith('DATABASE_URL='):
-            lines[i] = 'DATABASE_URL="sqlite:///./chatbot_minimal.db"\n'
-            db_url_found = True
-        elif line.startswith('DATABASE_URL_ASYNC='):
-            lines[i] = 'DATABASE_URL_ASYNC="sqlite+aiosqlite:///./chatbot_minimal.db"\n'
-            db_async_url_found = True
+    out_lines = []
+    for line in content.splitlines():
+        key, sep, _ = line.partition('=')
+        prefix = key + sep
+        if prefix in replacements:
+            out_lines.append(replacements[prefix])
+            remaining.discard(prefix)
+        else:
+            out_lines.append(line)
     
-    # Agregar si no existen
-    if not db_url_found:
-        lines.append('DATABASE_URL="sqlite:///./chatbot_minimal.db"\n')
-    if not db_async_url_found:
-        lines.append('DATABASE_URL_ASYNC="sqlite+aiosqlite:///./chatbot_minimal.db"\n')
+    out_lines.extend(replacements[prefix] for prefix in replacements if prefix in remaining)
     
-    # Escribir archivo
-    with open(env_file, 'w') as f:
-        f.writelines(lines)
+    env_file.write_text("\n".join(out_lines) + "\n")
     
     print("✅ Configuración actualizada")
 
@@ -2,11 +2,45 @@
 """
 Script para cambiar entre diferentes environments
 """
+import os
+import re
+import mmap
 import sys
 import shutil
 from pathlib import Path
+from typing import Dict, Optional
 import argparse
 
+# Variables que se muestran o validan; un único patrón compilado para
+# recorrer el archivo completo en lugar de analizar línea por línea
+_IMPORTANT_RE = re.compile(
+    r'^(APP_NAME|SECRET_KEY|DATABASE_URL|ENVIRONMENT|DEBUG|REDIS_ENABLED|'
+    r'EMAIL_ENABLED|STRIPE_ENABLED|LOG_LEVEL)=(.*?)\s*$',
+    re.MULTILINE
+)
+_IMPORTANT_RE_BYTES = re.compile(_IMPORTANT_RE.pattern.encode(), re.MULTILINE)
+
+def parse_important_vars(content: str) -> Dict[str, str]:
+    """Extraer las variables importantes del contenido de un .env"""
+    env_vars = {}
+    for match in _IMPORTANT_RE.finditer(content):
+        env_vars.setdefault(match.group(1), match.group(2))
+    return env_vars
+
+def read_important_vars(env_file: Path) -> Dict[str, str]:
+    """Extraer las variables importantes recorriendo el archivo mapeado en memoria
+    
+    Solo se decodifican las coincidencias, sin cargar el archivo como str.
+    """
+    env_vars = {}
+    with env_file.open('rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return env_vars
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for match in _IMPORTANT_RE_BYTES.finditer(mm):
+                env_vars.setdefault(match.group(1).decode(), match.group(2).decode())
+    return env_vars
+
 def set_environment(env: str):
     """Cambiar al environment especificado"""
     
@@ -22,25 +56,37 @@ def set_environment(env: str):
     env_file = backend_dir / ".env"
     source_file = backend_dir / f".env.{env}"
     
+    # Un solo listado del directorio; DirEntry cachea is_file()/stat()
+    with os.scandir(backend_dir) as it:
+        entries = {entry.name: entry for entry in it}
+    
     # Verificar que el archivo fuente existe
-    if not source_file.exists():
+    if source_file.name not in entries:
         print(f"❌ Archivo de configuración no encontrado: {source_file}")
         return False
     
     try:
         # Hacer backup del archivo actual si existe
-        if env_file.exists():
-            backup_file = backend_dir / f".env.backup.{env_file.stat().st_mtime}"
-            shutil.copy2(env_file, backup_file)
+        if '.env' in entries:
+            backup_file = backend_dir / f".env.backup.{entries['.env'].stat().st_mtime_ns}"
+            # Hardlink: el backup no copia datos; os.replace deja intacto su inodo
+            try:
+                os.link(env_file, backup_file)
+            except OSError:
+                shutil.copy2(env_file, backup_file)
             print(f"📦 Backup creado: {backup_file.name}")
         
-        # Copiar el nuevo archivo
-        shutil.copy2(source_file, env_file)
+        # Copiar el nuevo archivo (con sus permisos) y reemplazar .env de forma atómica
+        tmp_file = backend_dir / ".env.tmp"
+        shutil.copy2(source_file, tmp_file)
+        os.replace(tmp_file, env_file)
         print(f"✅ Environment cambiado a: {env}")
         print(f"📁 Archivo copiado: {source_file.name} → .env")
         
-        # Mostrar configuraciones importantes
-        show_environment_info(env_file)
+        # Mostrar y validar las configuraciones importantes leyendo el archivo una vez
+        content = env_file.read_text()
+        show_environment_info(env_file, content)
+        validate_environment(env_file, content)
         
         return True
         
@@ -48,13 +94,13 @@ def set_environment(env: str):
         print(f"❌ Error cambiando environment: {e}")
         return False
 
-def show_environment_info(env_file: Path):
+def show_environment_info(env_file: Path, content: Optional[str] = None):
     """Mostrar información importante del environment"""
     print("\n📋 Configuración actual:")
     
     try:
-        with open(env_file, 'r') as f:
-            lines = f.readlines()
+        if content is None:
+            content = env_file.read_text()
         
         important_vars = [
             'ENVIRONMENT',
@@ -66,11 +112,9 @@ def show_environment_info(env_file: Path):
             'LOG_LEVEL'
         ]
         
-        for line in lines:
-            if '=' in line and not line.strip().startswith('#'):
-                key, value = line.strip().split('=', 1)
-                if key in important_vars:
-                    print(f"   {key}: {value}")
+        for key, value in parse_important_vars(content).items():
+            if key in important_vars:
+                print(f"   {key}: {value}")
                     
     except Exception as e:
         print(f"⚠️ No se pudo leer la configuración: {e}")
@@ -81,28 +125,31 @@ def list_environments():
     
     backend_dir = Path(__file__).parent.parent
     
+    # Un solo listado del directorio en lugar de un stat por candidato
+    with os.scandir(backend_dir) as entries:
+        env_entries = {entry.name: entry for entry in entries if entry.name.startswith('.env.')}
+    
     for env in ['development', 'staging', 'production']:
-        env_file = backend_dir / f".env.{env}"
-        status = "✅" if env_file.exists() else "❌"
+        entry = env_entries.get(f".env.{env}")
+        status = "✅" if entry else "❌"
         print(f"   {status} {env}")
         
-        if env_file.exists():
+        if entry:
             # Mostrar algunas configuraciones clave
             try:
-                with open(env_file, 'r') as f:
-                    content = f.read()
-                    if 'DEBUG=true' in content:
-                        print(f"      🔧 Debug: Habilitado")
-                    if 'ENVIRONMENT=' in content:
-                        for line in content.split('\n'):
-                            if line.startswith('ENVIRONMENT='):
-                                env_val = line.split('=')[1].strip('"')
-                                print(f"      🌍 Environment: {env_val}")
-                                break
+                content = Path(entry.path).read_text()
+                if 'DEBUG=true' in content:
+                    print(f"      🔧 Debug: Habilitado")
+                if 'ENVIRONMENT=' in content:
+                    for line in content.split('\n'):
+                        if line.startswith('ENVIRONMENT='):
+                            env_val = line.split('=')[1].strip('"')
+                            print(f"      🌍 Environment: {env_val}")
+                            break
             except:
                 pass
 
-def validate_environment(env_file: Path):
+def validate_environment(env_file: Path, content: Optional[str] = None):
     """Validar que el environment tenga las configuraciones mínimas"""
     print(f"\n🔍 Validando configuración...")
     
@@ -117,20 +164,19 @@ def validate_environment(env_file: Path):
     empty_vars = []
     
     try:
-        with open(env_file, 'r') as f:
-            content = f.read()
+        if content is None:
+            env_vars = read_important_vars(env_file)
+        else:
+            env_vars = parse_important_vars(content)
         
         for var in required_vars:
-            if f"{var}=" not in content:
+            if var not in env_vars:
                 missing_vars.append(var)
             else:
                 # Verificar si está vacío
-                for line in content.split('\n'):
-                    if line.startswith(f"{var}="):
-                        value = line.split('=', 1)[1].strip().strip('"')
-                        if not value or value.startswith('your-') or value.startswith('CHANGE-THIS'):
-                            empty_vars.append(var)
-                        break
+                value = env_vars[var].strip('"')
+                if not value or value.startswith('your-') or value.startswith('CHANGE-THIS'):
+                    empty_vars.append(var)
         
         if missing_vars:
             print(f"❌ Variables faltantes: {', '.join(missing_vars)}")
@@ -179,10 +225,6 @@ def main():
             sys.exit(1)
         
         if set_environment(args.environment):
-            # Validar después de cambiar
-            env_file = Path(__file__).parent.parent / ".env"
-            validate_environment(env_file)
-            
             print(f"\n🚀 Para aplicar los cambios:")
             print("   1. Reinicia el servidor backend")
             print("   2. Verifica que los servicios externos estén configurados")
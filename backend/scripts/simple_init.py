@@ -10,112 +10,142 @@ from pathlib import Path
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import insert, inspect
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from app.core.config import get_settings
-from app.core.database import Base
-from app.core.security import SecurityManager
-from app.models.user import User
-from app.models.company import Company
-from app.models.chatbot import Chatbot
-import uuid
+from app.models.base import Base
+from app.models.user import User, UserRole, UserStatus
+from app.models.company import Company, CompanyStatus, CompanyType
+from app.models.chatbot import AIProvider, Chatbot, ChatbotStatus
+from scripts.common import compile_sqlite_schema, hash_passwords, new_id, remove_sqlite_files
 from datetime import datetime
 
 settings = get_settings()
 
-async def create_tables():
+def _sqlite_db_path():
+    """Ruta del archivo SQLite configurado, o None si no aplica"""
+    url = make_url(settings.DATABASE_URL_ASYNC)
+    if url.get_backend_name() == "sqlite" and url.database and url.database != ":memory:":
+        return Path(url.database)
+    return None
+
+def _check_columns(model, rows):
+    """Rechazar claves que no son columnas: el INSERT masivo las ignora en silencio"""
+    unknown = set().union(*rows) - set(inspect(model).column_attrs.keys())
+    if unknown:
+        raise ValueError(f"{model.__name__}: columnas desconocidas {sorted(unknown)}")
+    return rows
+
+async def create_tables(engine, incremental: bool = False):
     """Crear todas las tablas"""
     print("🔧 Creando tablas de la base de datos...")
     
-    engine = create_async_engine(settings.DATABASE_URL_ASYNC, echo=False)
+    # En SQLite, borrar el archivo es más barato que DROP + CREATE de cada tabla
+    db_path = None if incremental else _sqlite_db_path()
+    if db_path is not None:
+        remove_sqlite_files(db_path)
     
     async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.drop_all)
-        await conn.run_sync(Base.metadata.create_all)
+        if engine.dialect.name == "sqlite":
+            # DDL precompilado: evita la inspección y el ordenamiento de create_all
+            for statement in compile_sqlite_schema(Base.metadata, if_not_exists=True):
+                await conn.exec_driver_sql(statement)
+        else:
+            if not incremental:
+                await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        
+        if incremental:
+            # Conservar el esquema y vaciar las tablas en una sola transacción
+            for table in reversed(Base.metadata.sorted_tables):
+                await conn.execute(table.delete())
     
-    await engine.dispose()
     print("✅ Tablas creadas exitosamente")
 
-async def create_basic_data():
-    """Crear datos básicos usando ORM"""
+async def create_basic_data(session_maker):
+    """Crear datos básicos con INSERT masivos"""
     print("📝 Creando datos básicos...")
 
-    engine = create_async_engine(settings.DATABASE_URL_ASYNC, echo=False)
-    async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    admin_password, user_password = hash_passwords(["admin123", "user123"])
 
-    async with async_session() as session:
+    async with session_maker() as session:
         try:
+            # IDs generados en el cliente: no hace falta flush para referenciarlos
+            company_id = new_id()
+            admin_id = new_id()
+            user_id = new_id()
+
             # Crear empresa
-            company = Company(
-                id=str(uuid.uuid4()),
-                name="TechCorp Demo",
-                slug="techcorp-demo",
-                email="admin@techcorp.com",
-                company_type="other",
-                status="active",
-                max_users=10,
-                max_chatbots=5,
-                max_monthly_messages=10000
-            )
-            session.add(company)
-            await session.flush()  # Para obtener el ID
-
-            # Crear usuario administrador
-            admin_user = User(
-                id=str(uuid.uuid4()),
-                email="admin@techcorp.com",
-                hashed_password=SecurityManager.get_password_hash("admin123"),
-                full_name="Administrador Demo",
-                role="SUPERADMIN",
-                is_active=True,
-                is_verified=True,
-                company_id=company.id
-            )
-            session.add(admin_user)
-
-            # Crear usuario regular
-            regular_user = User(
-                id=str(uuid.uuid4()),
-                email="user@techcorp.com",
-                hashed_password=SecurityManager.get_password_hash("user123"),
-                full_name="Usuario Demo",
-                role="USER",
-                is_active=True,
-                is_verified=True,
-                company_id=company.id
-            )
-            session.add(regular_user)
-
-            await session.flush()  # Para obtener los IDs de usuarios
+            await session.execute(insert(Company), _check_columns(Company, [{
+                "id": company_id,
+                "name": "TechCorp Demo",
+                "slug": "techcorp-demo",
+                "email": "admin@techcorp.com",
+                "company_type": CompanyType.OTHER,
+                "status": CompanyStatus.ACTIVE,
+                "max_users": 10,
+                "max_chatbots": 5,
+                "max_monthly_messages": 10000
+            }]))
+
+            # Crear usuarios (administrador y regular) en un solo INSERT
+            users_payload = [
+                {
+                    "id": admin_id,
+                    "email": "admin@techcorp.com",
+                    "hashed_password": admin_password,
+                    "first_name": "Administrador",
+                    "last_name": "Demo",
+                    "role": UserRole.SUPER_ADMIN,
+                    "status": UserStatus.ACTIVE,
+                    "is_active": True,
+                    "is_verified": True,
+                    "company_id": company_id
+                },
+                {
+                    "id": user_id,
+                    "email": "user@techcorp.com",
+                    "hashed_password": user_password,
+                    "first_name": "Usuario",
+                    "last_name": "Demo",
+                    "role": UserRole.VIEWER,
+                    "status": UserStatus.ACTIVE,
+                    "is_active": True,
+                    "is_verified": True,
+                    "company_id": company_id
+                }
+            ]
+            await session.execute(insert(User), _check_columns(User, users_payload))
 
             # Crear chatbots
-            chatbot1 = Chatbot(
-                id=str(uuid.uuid4()),
-                name="Asistente de Ventas",
-                description="Chatbot especializado en ventas y atención al cliente",
-                model="gpt-3.5-turbo",
-                system_prompt="Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
-                temperature=0.7,
-                max_tokens=150,
-                status="ACTIVE",
-                company_id=company.id,
-                created_by=admin_user.id
-            )
-            session.add(chatbot1)
-
-            chatbot2 = Chatbot(
-                id=str(uuid.uuid4()),
-                name="Soporte Técnico",
-                description="Chatbot para resolver problemas técnicos y dudas sobre productos",
-                model="gpt-4",
-                system_prompt="Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
-                temperature=0.3,
-                max_tokens=200,
-                status="ACTIVE",
-                company_id=company.id,
-                created_by=admin_user.id
-            )
-            session.add(chatbot2)
+            chatbots_payload = [
+                {
+                    "id": new_id(),
+                    "name": "Asistente de Ventas",
+                    "description": "Chatbot especializado en ventas y atención al cliente",
+                    "primary_ai_provider": AIProvider.OPENAI_GPT4_MINI,
+                    "custom_instructions": "Eres un asistente de ventas amigable y profesional. Ayudas a los clientes a encontrar productos y resolver dudas sobre compras.",
+                    "temperature": 70,
+                    "max_tokens": 150,
+                    "status": ChatbotStatus.ACTIVE,
+                    "company_id": company_id,
+                    "created_by": admin_id
+                },
+                {
+                    "id": new_id(),
+                    "name": "Soporte Técnico",
+                    "description": "Chatbot para resolver problemas técnicos y dudas sobre productos",
+                    "primary_ai_provider": AIProvider.OPENAI_GPT4,
+                    "custom_instructions": "Eres un especialista en soporte técnico. Ayudas a resolver problemas técnicos de manera clara y paso a paso.",
+                    "temperature": 30,
+                    "max_tokens": 200,
+                    "status": ChatbotStatus.ACTIVE,
+                    "company_id": company_id,
+                    "created_by": admin_id
+                }
+            ]
+            await session.execute(insert(Chatbot), _check_columns(Chatbot, chatbots_payload))
 
             await session.commit()
 
@@ -132,16 +162,26 @@ async def create_basic_data():
         finally:
             await session.close()
 
-    await engine.dispose()
-
 async def main():
     """Función principal"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Inicialización simple de base de datos")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Vaciar las tablas existentes en lugar de recrear la base de datos")
+    
+    args = parser.parse_args()
+    
     print("🎯 Inicialización Simple de Base de Datos")
     print("=" * 50)
     
+    # Un único motor y sessionmaker para ambas fases
+    engine = create_async_engine(settings.DATABASE_URL_ASYNC, echo=False, pool_pre_ping=False)
+    session_maker = async_sessionmaker(engine, expire_on_commit=False)
+    
     try:
-        await create_tables()
-        await create_basic_data()
+        await create_tables(engine, incremental=args.incremental)
+        await create_basic_data(session_maker)
         print("🎉 Inicialización completada exitosamente!")
         
     except Exception as e:
@@ -149,6 +189,8 @@ async def main():
         import traceback
         traceback.print_exc()
         sys.exit(1)
+    finally:
+        await engine.dispose()
 
 if __name__ == "__main__":
     asyncio.run(main())
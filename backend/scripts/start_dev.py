@@ -5,7 +5,6 @@ Script para iniciar el servidor de desarrollo
 import os
 import sys
 import subprocess
-import asyncio
 from pathlib import Path
 
 # Agregar el directorio raíz al path
@@ -33,16 +32,24 @@ def setup_environment():
     env_file = Path(__file__).parent.parent / ".env.development"
     if env_file.exists():
         # Cargar variables de entorno desde archivo
-        with open(env_file) as f:
-            for line in f:
-                if line.strip() and not line.startswith('#'):
-                    key, value = line.strip().split('=', 1)
-                    os.environ[key] = value.strip('"')
+        for line in env_file.read_text().splitlines():
+            if line.strip() and not line.startswith('#'):
+                key, value = line.strip().split('=', 1)
+                os.environ[key] = value.strip('"')
         print("✅ Variables de entorno cargadas")
     else:
         print("⚠️ Archivo .env.development no encontrado, usando valores por defecto")
 
-async def init_database():
+async def create_database():
+    """Crear tablas y datos de prueba"""
+    from scripts.init_db import create_tables, create_test_data, dispose_engine
+    try:
+        await create_tables()
+        await create_test_data()
+    finally:
+        await dispose_engine()
+
+def init_database():
     """Inicializar base de datos si es necesario"""
     print("🗄️ Verificando base de datos...")
     
@@ -51,9 +58,9 @@ async def init_database():
     if not db_file.exists():
         print("📝 Base de datos no existe, creando...")
         try:
-            from scripts.init_db import create_tables, create_test_data
-            await create_tables()
-            await create_test_data()
+            # Solo esta fase es asíncrona: el event loop vive lo que dura la creación
+            import asyncio
+            asyncio.run(create_database())
             print("✅ Base de datos inicializada con datos de prueba")
         except Exception as e:
             print(f"❌ Error inicializando base de datos: {e}")
@@ -86,18 +93,25 @@ def start_server():
         print(f"🔧 Redoc: http://localhost:8000/redoc")
         print("\n🛑 Presiona Ctrl+C para detener el servidor\n")
         
-        # Ejecutar el servidor
-        subprocess.run(cmd)
+        if os.name == 'nt':
+            # En Windows exec no reemplaza el proceso: se usa un proceso hijo
+            try:
+                subprocess.run(cmd)
+            except KeyboardInterrupt:
+                print("\n👋 Servidor detenido")
+        else:
+            # Reemplazar este proceso por uvicorn: sin proceso padre en espera
+            # y con Ctrl+C entregado directamente al servidor
+            sys.stdout.flush()
+            os.execvp(cmd[0], cmd)
         
-    except KeyboardInterrupt:
-        print("\n👋 Servidor detenido")
     except Exception as e:
         print(f"❌ Error iniciando servidor: {e}")
         return False
     
     return True
 
-async def main():
+def main():
     """Función principal"""
     print("🎯 ConversaAI - Servidor de Desarrollo")
     print("=" * 50)
@@ -110,11 +124,11 @@ async def main():
     setup_environment()
     
     # Inicializar base de datos
-    if not await init_database():
+    if not init_database():
         sys.exit(1)
     
     # Iniciar servidor
     start_server()
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
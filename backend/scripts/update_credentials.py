@@ -4,29 +4,50 @@ Script para actualizar las credenciales de prueba en la base de datos
 """
 import sqlite3
 import sys
-import uuid
 from pathlib import Path
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from app.core.security import SecurityManager
+from scripts.common import SQLITE_PRAGMAS, hash_passwords, new_id
 
-def update_credentials():
+def update_credentials(conn: sqlite3.Connection):
     """Actualizar credenciales de prueba"""
     print("🔐 Actualizando credenciales de prueba...")
     
-    # Conectar a la base de datos
-    db_path = Path(__file__).parent.parent / "chatbot_minimal.db"
+    # Crear nuevos usuarios con las credenciales especificadas
+    users = [
+        {
+            "id": new_id(),
+            "email": "johan@techcorp.com",
+            "password": "SuperAdmin123!",
+            "full_name": "Johan SuperAdmin",
+            "role": "SUPERADMIN"
+        },
+        {
+            "id": new_id(),
+            "email": "admin@techcorp.com",
+            "password": "Admin123!",
+            "full_name": "Administrador",
+            "role": "ADMIN"
+        },
+        {
+            "id": new_id(),
+            "email": "usuario1@techcorp.com",
+            "password": "User123!",
+            "full_name": "Usuario Demo",
+            "role": "USER"
+        }
+    ]
     
-    if not db_path.exists():
-        print(f"❌ Base de datos no encontrada: {db_path}")
-        return False
+    # Hashear antes de abrir la transacción para mantenerla corta
+    hashed_passwords = hash_passwords([user["password"] for user in users])
     
-    conn = sqlite3.connect(str(db_path))
     cursor = conn.cursor()
     
     try:
+        cursor.execute("BEGIN")
+        
         # Limpiar usuarios existentes
         cursor.execute("DELETE FROM users")
         
@@ -35,58 +56,29 @@ def update_credentials():
         result = cursor.fetchone()
         if not result:
             print("❌ No se encontró empresa en la base de datos")
+            conn.rollback()
             return False
         
         company_id = result[0]
         
-        # Crear nuevos usuarios con las credenciales especificadas
-        users = [
-            {
-                "id": str(uuid.uuid4()),
-                "email": "johan@techcorp.com",
-                "password": "SuperAdmin123!",
-                "full_name": "Johan SuperAdmin",
-                "role": "SUPERADMIN"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "email": "admin@techcorp.com",
-                "password": "Admin123!",
-                "full_name": "Administrador",
-                "role": "ADMIN"
-            },
-            {
-                "id": str(uuid.uuid4()),
-                "email": "usuario1@techcorp.com",
-                "password": "User123!",
-                "full_name": "Usuario Demo",
-                "role": "USER"
-            }
+        # Insertar usuarios (una sentencia preparada, N filas)
+        rows = [
+            (user["id"], user["email"], hashed_password, user["full_name"], user["role"], company_id)
+            for user, hashed_password in zip(users, hashed_passwords)
         ]
+        cursor.executemany("""
+            INSERT INTO users (id, email, hashed_password, full_name, role, is_active, is_verified, company_id)
+            VALUES (?, ?, ?, ?, ?, 1, 1, ?)
+        """, rows)
         
-        # Insertar usuarios
         for user in users:
-            hashed_password = SecurityManager.get_password_hash(user["password"])
-            
-            cursor.execute("""
-                INSERT INTO users (id, email, hashed_password, full_name, role, is_active, is_verified, company_id)
-                VALUES (?, ?, ?, ?, ?, 1, 1, ?)
-            """, (
-                user["id"],
-                user["email"],
-                hashed_password,
-                user["full_name"],
-                user["role"],
-                company_id
-            ))
-            
             print(f"✅ Usuario creado: {user['email']} ({user['role']})")
         
         # Actualizar chatbots para que tengan el created_by correcto (SuperAdmin)
         superadmin_id = users[0]["id"]  # Johan
         cursor.execute("UPDATE chatbots SET created_by = ?", (superadmin_id,))
         
-        conn.commit()
+        cursor.execute("COMMIT")
         
         print("\n🎉 Credenciales actualizadas exitosamente!")
         print("\n👤 Credenciales de Prueba:")
@@ -100,15 +92,11 @@ def update_credentials():
         print(f"❌ Error actualizando credenciales: {e}")
         conn.rollback()
         return False
-    finally:
-        conn.close()
 
-def verify_credentials():
+def verify_credentials(conn: sqlite3.Connection):
     """Verificar que las credenciales funcionan"""
     print("\n🔍 Verificando credenciales...")
     
-    db_path = Path(__file__).parent.parent / "chatbot_minimal.db"
-    conn = sqlite3.connect(str(db_path))
     cursor = conn.cursor()
     
     try:
@@ -133,25 +121,37 @@ def verify_credentials():
     except Exception as e:
         print(f"❌ Error verificando credenciales: {e}")
         return False
-    finally:
-        conn.close()
 
 def main():
     """Función principal"""
     print("🎯 Actualización de Credenciales de Prueba")
     print("=" * 50)
     
-    if update_credentials():
-        verify_credentials()
-        
-        print("\n🚀 Para probar las credenciales:")
-        print("   1. Asegúrate de que el backend esté ejecutándose")
-        print("   2. Ve a http://localhost:4322/login")
-        print("   3. Usa cualquiera de las credenciales mostradas arriba")
-        
-    else:
+    db_path = Path(__file__).parent.parent / "chatbot_minimal.db"
+    
+    if not db_path.exists():
+        print(f"❌ Base de datos no encontrada: {db_path}")
         print("❌ Error durante la actualización")
         sys.exit(1)
+    
+    # Una sola conexión (y un solo juego de PRAGMAs) para actualizar y verificar
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    conn.executescript(SQLITE_PRAGMAS)
+    
+    try:
+        if update_credentials(conn):
+            verify_credentials(conn)
+            
+            print("\n🚀 Para probar las credenciales:")
+            print("   1. Asegúrate de que el backend esté ejecutándose")
+            print("   2. Ve a http://localhost:4322/login")
+            print("   3. Usa cualquiera de las credenciales mostradas arriba")
+            
+        else:
+            print("❌ Error durante la actualización")
+            sys.exit(1)
+    finally:
+        conn.close()
 
 if __name__ == "__main__":
     main()
@@ -1,52 +1,209 @@
 """
 Configuración de pytest para los tests
 """
+import os
 import pytest
+import pytest_asyncio
 import asyncio
+from datetime import datetime, timedelta, timezone
 from typing import Generator, AsyncGenerator
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import create_engine, event, insert, inspect
+from sqlalchemy.orm import make_transient_to_detached, sessionmaker
 from sqlalchemy.pool import StaticPool
+from passlib.context import CryptContext
 
+try:
+    import uvloop  # Instalado con uvicorn[standard] salvo en Windows
+except ImportError:
+    uvloop = None
+
+from app import models  # noqa: F401 - Registrar todos los modelos antes de compilar el esquema
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.database import get_db
+from app.models.base import Base
+from app.core import security
 from app.core.security import security_manager
 from app.models.user import User, UserRole, UserStatus
 from app.models.company import Company, CompanyStatus, CompanyType
+from scripts.common import compile_sqlite_schema
+
+# Base de datos en memoria para tests, una por worker de pytest-xdist; con
+# nombre y caché compartida para que cualquier otra conexión del proceso vea
+# el mismo esquema y datos. No activar WAL: es incompatible con cache=shared
+SQLALCHEMY_DATABASE_URL = "sqlite:///file:testdb_{worker}?mode=memory&cache=shared&uri=true"
+
+def make_engine():
+    """Create the in-memory database engine for the current xdist worker."""
+    worker = os.environ.get("PYTEST_XDIST_WORKER", "gw0")
+    engine = create_engine(
+        SQLALCHEMY_DATABASE_URL.format(worker=worker),
+        connect_args={"check_same_thread": False, "uri": True},
+        poolclass=StaticPool,
+    )
+
+    # pysqlite no emite BEGIN por sí mismo; sin esto los SAVEPOINT no
+    # quedarían anidados dentro de la transacción externa de cada test
+    @event.listens_for(engine, "connect")
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def do_begin(connection):
+        connection.exec_driver_sql("BEGIN")
+
+    return engine
 
-# Base de datos en memoria para tests
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
+class FrozenDict(dict):
+    """dict de solo lectura para datos compartidos entre tests.
+    
+    Al ser un dict sigue siendo serializable a JSON (json=..., headers=...);
+    dict(...) devuelve una copia modificable.
+    """
+    
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only; use dict(...) for a mutable copy")
+    
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+    
+    def __reduce__(self):
+        return (type(self), (dict(self),))
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool,
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+# bcrypt con el coste mínimo durante los tests (TEST_FAST_PASSWORD_HASH=0
+# para usar el contexto de producción)
+FAST_PASSWORD_HASH = os.getenv("TEST_FAST_PASSWORD_HASH", "1") != "0"
+test_pwd_context = (
+    CryptContext(schemes=["bcrypt"], bcrypt__rounds=4)
+    if FAST_PASSWORD_HASH
+    else security.pwd_context
 )
 
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Hashes calculados una sola vez: bcrypt es deliberadamente lento
+TEST_USER_PASSWORD_HASH = test_pwd_context.hash("TestPassword123!")
+TEST_SUPERADMIN_PASSWORD_HASH = test_pwd_context.hash("SuperAdmin123!")
+
+# Datos semilla compartidos por todos los tests; timestamps explícitos para
+# que sean iguales en todas las filas
+SEED_TIMESTAMP = datetime.now(timezone.utc)
+
+TEST_COMPANY_ROW = {
+    "id": "test-company-1",
+    "name": "Test Company",
+    "slug": "test-company",
+    "email": "test@company.com",
+    "status": CompanyStatus.ACTIVE,
+    "company_type": CompanyType.OTHER,
+    "created_at": SEED_TIMESTAMP,
+    "updated_at": SEED_TIMESTAMP,
+}
+
+TEST_USER_ROW = {
+    "id": "test-user-1",
+    "email": "test@example.com",
+    "first_name": "Test",
+    "last_name": "User",
+    "hashed_password": TEST_USER_PASSWORD_HASH,
+    "role": UserRole.COMPANY_ADMIN,
+    "status": UserStatus.ACTIVE,
+    "company_id": TEST_COMPANY_ROW["id"],
+    "created_at": SEED_TIMESTAMP,
+    "updated_at": SEED_TIMESTAMP,
+}
+
+TEST_SUPERADMIN_ROW = {
+    "id": "test-superadmin-1",
+    "email": "admin@example.com",
+    "first_name": "Super",
+    "last_name": "Admin",
+    "hashed_password": TEST_SUPERADMIN_PASSWORD_HASH,
+    "role": UserRole.SUPER_ADMIN,
+    "status": UserStatus.ACTIVE,
+    "company_id": TEST_COMPANY_ROW["id"],
+    "created_at": SEED_TIMESTAMP,
+    "updated_at": SEED_TIMESTAMP,
+}
+
+# Un solo token por usuario para toda la sesión de tests; el rol se toma de
+# las constantes porque la columna lo devuelve como str, no como UserRole
+TEST_TOKEN_EXPIRES = timedelta(days=1)
+
+@pytest.fixture(scope="session", autouse=True)
+def uvloop_policy():
+    """Install uvloop's policy before pytest-asyncio creates any event loop."""
+    if uvloop is None:
+        yield
+        return
+    original_policy = asyncio.get_event_loop_policy()
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    yield
+    asyncio.set_event_loop_policy(original_policy)
+
+@pytest.fixture(scope="session", autouse=True)
+def fast_password_hashing():
+    """Swap the app's password context for the cheap test one during the session."""
+    original_context = security.pwd_context
+    security.pwd_context = test_pwd_context
+    yield
+    security.pwd_context = original_context
+
+@pytest.fixture(scope="session")
+def engine():
+    """Create the in-memory database engine once per test session (and worker)."""
+    engine = make_engine()
+    yield engine
+    engine.dispose()
+
+@pytest.fixture(scope="session")
+def tables(engine):
+    """Create the database schema once per test session."""
+    # El DDL se compila aquí y no al importar conftest: un error de esquema
+    # solo afecta a los tests que usan la base de datos
+    schema_ddl = compile_sqlite_schema(Base.metadata)
+    raw_connection = engine.raw_connection()
+    try:
+        raw_connection.driver_connection.executescript(";\n".join(schema_ddl) + ";\n")
+    finally:
+        raw_connection.close()
+    yield
+
+@pytest.fixture(scope="session")
+def connection(engine, tables):
+    """Open the connection and outer transaction shared by the whole test session."""
+    connection = engine.connect()
+    transaction = connection.begin()
+    yield connection
+    transaction.rollback()
+    connection.close()
 
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def seed_session(connection):
+    """Session used to insert the seed rows shared by every test."""
+    # Enlazada a la conexión compartida: los flush() escriben en la
+    # transacción externa, que vive durante toda la sesión de tests
+    session = TestingSessionLocal(bind=connection, expire_on_commit=False)
+    yield session
+    session.close()
 
 @pytest.fixture
-def db_session():
-    """Create a fresh database session for each test."""
-    Base.metadata.create_all(bind=engine)
-    session = TestingSessionLocal()
+def db_session(connection):
+    """Create a database session isolated in a SAVEPOINT rolled back after each test."""
+    savepoint = connection.begin_nested()
+    # Cada commit() del test libera un SAVEPOINT y la sesión abre otro;
+    # el rollback del SAVEPOINT externo deshace todo salvo los datos semilla
+    session = TestingSessionLocal(bind=connection, join_transaction_mode="create_savepoint")
     try:
         yield session
     finally:
         session.close()
-        Base.metadata.drop_all(bind=engine)
+        savepoint.rollback()
 
 @pytest.fixture
-def client(db_session):
-    """Create a test client with database dependency override."""
+def override_db(db_session):
+    """Point the app's get_db dependency at the test session."""
     def override_get_db():
         try:
             yield db_session
@@ -54,109 +211,123 @@ def client(db_session):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    yield
+    app.dependency_overrides.pop(get_db, None)
+
+@pytest.fixture(scope="session")
+def app_client():
+    """Create a test client whose lifespan runs once for the whole session."""
     with TestClient(app) as test_client:
         yield test_client
-    app.dependency_overrides.clear()
 
 @pytest.fixture
-def test_company(db_session):
-    """Create a test company."""
-    company = Company(
-        id="test-company-1",
-        name="Test Company",
-        slug="test-company",
-        email="test@company.com",
-        status=CompanyStatus.ACTIVE,
-        company_type=CompanyType.STARTUP
+def client(app_client, override_db):
+    """Create a test client with database dependency override."""
+    return app_client
+
+@pytest_asyncio.fixture
+async def async_client(override_db) -> AsyncGenerator[AsyncClient, None]:
+    """Create an async test client that calls the ASGI app directly, without TestClient's thread portal."""
+    transport = ASGITransport(app=app, raise_app_exceptions=True)
+    async with AsyncClient(transport=transport, base_url="http://test") as test_client:
+        yield test_client
+
+def _column_values(obj) -> dict:
+    """Snapshot every column attribute of a loaded ORM instance."""
+    return {attr.key: getattr(obj, attr.key) for attr in inspect(obj).mapper.column_attrs}
+
+def _detached(model, values: dict):
+    """Build a detached instance of an already persisted row without querying the database."""
+    obj = model(**values)
+    make_transient_to_detached(obj)
+    return obj
+
+@pytest.fixture(scope="session")
+def _seed(seed_session):
+    """Insert the shared seed rows in one statement per table."""
+    # RETURNING devuelve las filas completas (incluidos los defaults) sin SELECT extra
+    company = seed_session.scalars(
+        insert(Company).returning(Company), [TEST_COMPANY_ROW]
+    ).one()
+    user, superadmin = seed_session.scalars(
+        insert(User).returning(User, sort_by_parameter_order=True),
+        [TEST_USER_ROW, TEST_SUPERADMIN_ROW]
+    ).all()
+    seed = FrozenDict(
+        company=FrozenDict(_column_values(company)),
+        user=FrozenDict(_column_values(user)),
+        superadmin=FrozenDict(_column_values(superadmin)),
     )
-    db_session.add(company)
-    db_session.commit()
-    db_session.refresh(company)
-    return company
+    seed_session.expunge_all()
+    return seed
+
+# Cada test recibe su propia instancia separada de la sesión, así los cambios
+# que haga en el objeto no se filtran a otros tests
+@pytest.fixture
+def test_company(_seed):
+    """Create a test company."""
+    return _detached(Company, _seed["company"])
 
 @pytest.fixture
-def test_user(db_session, test_company):
+def test_user(_seed):
     """Create a test user."""
-    user = User(
-        id="test-user-1",
-        email="test@example.com",
-        first_name="Test",
-        last_name="User",
-        password_hash=security_manager.get_password_hash("TestPassword123!"),
-        role=UserRole.COMPANY_ADMIN,
-        status=UserStatus.ACTIVE,
-        company_id=test_company.id
-    )
-    db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
-    return user
+    return _detached(User, _seed["user"])
 
 @pytest.fixture
-def test_superadmin(db_session, test_company):
+def test_superadmin(_seed):
     """Create a test superadmin user."""
-    user = User(
-        id="test-superadmin-1",
-        email="admin@example.com",
-        first_name="Super",
-        last_name="Admin",
-        password_hash=security_manager.get_password_hash("SuperAdmin123!"),
-        role=UserRole.SUPER_ADMIN,
-        status=UserStatus.ACTIVE,
-        company_id=test_company.id
-    )
-    db_session.add(user)
-    db_session.commit()
-    db_session.refresh(user)
-    return user
+    return _detached(User, _seed["superadmin"])
 
-@pytest.fixture
-def auth_headers(test_user):
+@pytest.fixture(scope="session")
+def auth_headers(_seed):
     """Create authentication headers for test user."""
     access_token = security_manager.create_access_token(
-        data={"sub": test_user.id, "email": test_user.email, "role": test_user.role.value}
+        data={"sub": TEST_USER_ROW["id"], "email": TEST_USER_ROW["email"], "role": TEST_USER_ROW["role"].value},
+        expires_delta=TEST_TOKEN_EXPIRES
     )
-    return {"Authorization": f"Bearer {access_token}"}
+    return FrozenDict({"Authorization": f"Bearer {access_token}"})
 
-@pytest.fixture
-def superadmin_headers(test_superadmin):
+@pytest.fixture(scope="session")
+def superadmin_headers(_seed):
     """Create authentication headers for superadmin user."""
     access_token = security_manager.create_access_token(
-        data={"sub": test_superadmin.id, "email": test_superadmin.email, "role": test_superadmin.role.value}
+        data={"sub": TEST_SUPERADMIN_ROW["id"], "email": TEST_SUPERADMIN_ROW["email"], "role": TEST_SUPERADMIN_ROW["role"].value},
+        expires_delta=TEST_TOKEN_EXPIRES
     )
-    return {"Authorization": f"Bearer {access_token}"}
+    return FrozenDict({"Authorization": f"Bearer {access_token}"})
 
-# Datos de prueba comunes
-@pytest.fixture
+# Datos de prueba comunes; de solo lectura porque se comparten entre tests
+# (usar dict(...) para obtener una copia modificable)
+@pytest.fixture(scope="session")
 def sample_chatbot_data():
     """Sample chatbot data for testing."""
-    return {
+    return FrozenDict({
         "name": "Test Chatbot",
         "description": "A test chatbot",
         "greeting_message": "Hello! How can I help you?",
         "fallback_message": "I don't understand. Can you rephrase?",
         "personality": "helpful",
         "primary_ai_provider": "gemini_flash_lite"
-    }
+    })
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_integration_data():
     """Sample integration data for testing."""
-    return {
+    return FrozenDict({
         "name": "Test WhatsApp Integration",
         "integration_type": "whatsapp",
-        "config": {
+        "config": FrozenDict({
             "phone_number_id": "123456789",
             "access_token": "test_token"
-        }
-    }
+        })
+    })
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def sample_notification_data():
     """Sample notification data for testing."""
-    return {
+    return FrozenDict({
         "title": "Test Notification",
         "message": "This is a test notification",
         "type": "info",
         "priority": "medium"
-    }
+    })